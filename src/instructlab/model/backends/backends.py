@@ -3,14 +3,16 @@
 # Standard
 from time import monotonic, sleep
 from types import FrameType
-from typing import Optional, Tuple
+from typing import Callable, Optional, Tuple
+import functools
 import json
 import logging
 import multiprocessing
 import os
 import pathlib
 import signal
-import struct
+import socket
+import stat
 import subprocess
 import sys
 
@@ -30,9 +32,24 @@ logger = logging.getLogger(__name__)
 
 SUPPORTED_BACKENDS = frozenset({LLAMA_CPP, VLLM})
 
+# The GGUF spec fixes the first four bytes of the file to the ASCII magic "GGUF"
+GGUF_MAGIC = b"GGUF"
+
 
 class UvicornServer(uvicorn.Server):
-    """Override uvicorn.Server to handle SIGINT."""
+    """Override uvicorn.Server to handle SIGINT and to report when it is ready."""
+
+    def __init__(
+        self, config: Config, on_ready: Optional[Callable[[], None]] = None
+    ) -> None:
+        super().__init__(config)
+        self.on_ready = on_ready
+
+    async def startup(self, sockets: Optional[list[socket.socket]] = None) -> None:
+        await super().startup(sockets=sockets)
+        # should_exit is set when the application failed to start
+        if self.on_ready is not None and not self.should_exit:
+            self.on_ready()
 
     def handle_exit(self, sig: int, frame: Optional[FrameType]) -> None:
         if not is_temp_server_running() or sig != signal.SIGINT:
@@ -86,25 +103,32 @@ def is_model_safetensors(model_path: pathlib.Path) -> bool:
 def is_model_gguf(model_path: pathlib.Path) -> bool:
     """
     Check if the file is a GGUF file.
+
+    Only the 4-byte magic number at the start of the file is read, the
+    GGUF metadata and tensor index are not parsed.
     Args:
         model_path (Path): The path to the file.
     Returns:
         bool: True if the file is a GGUF file, False otherwise.
     """
-    # Third Party
-    from gguf.constants import GGUF_MAGIC
-
     try:
-        with model_path.open("rb") as f:
-            first_four_bytes = f.read(4)
+        # Unbuffered read, the magic number is all that is needed
+        fd = os.open(model_path, os.O_RDONLY)
+        try:
+            return os.read(fd, len(GGUF_MAGIC)) == GGUF_MAGIC
+        finally:
+            os.close(fd)
+    except OSError as exc:
+        logger.debug("Failed to read GGUF magic from '%s': %s", model_path, exc)
+        return False
 
-        # Convert the first four bytes to an integer
-        first_four_bytes_int = int(struct.unpack("<I", first_four_bytes)[0])
 
-        return first_four_bytes_int == GGUF_MAGIC
-    except IsADirectoryError as exc:
-        logger.debug(f"GGUF Path is a directory, returning {exc}")
-        return False
+@functools.lru_cache(maxsize=32)
+def _cached_is_model_gguf(model_path: str, _file_id: Tuple[int, ...]) -> bool:
+    """Memoized is_model_gguf, keyed on the resolved path and the file identity."""
+    # _file_id is only part of the cache key so a replaced, modified or re-permissioned
+    # file is read again, including after a failed read
+    return is_model_gguf(pathlib.Path(model_path))
 
 
 def determine_backend(model_path: pathlib.Path) -> Tuple[str, str]:
@@ -120,7 +144,8 @@ def determine_backend(model_path: pathlib.Path) -> Tuple[str, str]:
     if model_path.is_dir() and is_model_safetensors(model_path):
         if sys.platform == "linux":
             logger.debug(
-                f"Model is huggingface safetensors and system is Linux, using {VLLM} backend."
+                "Model is huggingface safetensors and system is Linux, using %s backend.",
+                VLLM,
             )
             return (
                 VLLM,
@@ -134,14 +159,20 @@ def determine_backend(model_path: pathlib.Path) -> Tuple[str, str]:
 
     # Check if the model is a GGUF file
     try:
-        is_gguf = is_model_gguf(model_path)
+        st = model_path.stat()
+        # Only a regular file can be a GGUF file, anything else is not opened.
+        # The file name is not checked, GGUF files are not required to use .gguf
+        is_gguf = stat.S_ISREG(st.st_mode) and _cached_is_model_gguf(
+            str(model_path.resolve()),
+            (st.st_ino, st.st_size, st.st_mtime_ns, st.st_ctime_ns),
+        )
     except Exception as e:
         raise ValueError(
             f"Failed to determine whether the model is a GGUF format: {e}"
         ) from e
 
     if is_gguf:
-        logger.debug(f"Model is a GGUF file, using {LLAMA_CPP} backend.")
+        logger.debug("Model is a GGUF file, using %s backend.", LLAMA_CPP)
         return LLAMA_CPP, "model is a GGUF file."
 
     raise ValueError(
@@ -161,7 +192,7 @@ def get(model_path: pathlib.Path, backend: str | None) -> str:
         str: The backend to use.
     """
     # Check if the model is a GGUF file
-    logger.debug(f"Auto-detecting backend for model {model_path}")
+    logger.debug("Auto-detecting backend for model %s", model_path)
     try:
         auto_detected_backend, auto_detected_backend_reason = determine_backend(
             model_path
@@ -169,24 +200,27 @@ def get(model_path: pathlib.Path, backend: str | None) -> str:
     except ValueError as e:
         raise ValueError(f"Cannot determine which backend to use: {e}") from e
 
-    logger.debug(f"Auto-detected backend: {auto_detected_backend}")
+    logger.debug("Auto-detected backend: %s", auto_detected_backend)
     # When the backend is not set using the --backend flag, determine the backend automatically
     # 'backend' is optional so we still check for None or empty string in case 'config.yaml' hasn't
     # been updated via 'ilab config init'
     if backend is None:
         logger.debug(
-            f"Backend is not set using auto-detected value: {auto_detected_backend}"
+            "Backend is not set using auto-detected value: %s", auto_detected_backend
         )
         backend = auto_detected_backend
     # If the backend was set using the --backend flag, validate it.
     else:
-        logger.debug(f"Validating '{backend}' backend")
+        logger.debug("Validating '%s' backend", backend)
         # If the backend was set explicitly, but we detected the model should use a different backend, raise an error
         if backend != auto_detected_backend:
             logger.warning(
-                f"The serving backend '{backend}' was configured explicitly, but the provided model is not compatible with it. "
-                f"The model was detected as '{auto_detected_backend}, reason: {auto_detected_backend_reason}'.\n"
-                "The backend startup sequence will continue with the configured backend but might fail."
+                "The serving backend '%s' was configured explicitly, but the provided model is not compatible with it. "
+                "The model was detected as '%s, reason: %s'.\n"
+                "The backend startup sequence will continue with the configured backend but might fail.",
+                backend,
+                auto_detected_backend,
+                auto_detected_backend_reason,
             )
 
     return backend
@@ -224,7 +258,7 @@ def shutdown_process(process: subprocess.Popen, timeout: int) -> None:
         Nothing
     """
     # vLLM responds to SIGINT by shutting down gracefully and reaping the children
-    logger.debug(f"Sending SIGINT to vLLM server PID {process.pid}")
+    logger.debug("Sending SIGINT to vLLM server PID %s", process.pid)
     process_group_id = os.getpgid(process.pid)
     process.send_signal(signal.SIGINT)
     try:
@@ -232,7 +266,7 @@ def shutdown_process(process: subprocess.Popen, timeout: int) -> None:
         process.wait(timeout)
     except subprocess.TimeoutExpired:
         logger.debug(
-            f"Sending SIGKILL to vLLM server since timeout ({timeout}s) expired"
+            "Sending SIGKILL to vLLM server since timeout (%ss) expired", timeout
         )
         process.kill()
 
@@ -355,7 +389,7 @@ def get_uvicorn_config(app: fastapi.FastAPI, host: str, port: int) -> Config:
         port=port,
         log_level=logging.ERROR,
         limit_concurrency=2,  # Make sure we only serve a single client at a time
-        timeout_keep_alive=0,  # prevent clients holding connections open (we only have 1)
+        timeout_keep_alive=5,  # let the single client reuse its connection between turns
     )
 
 
@@ -1,23 +1,20 @@
 # SPDX-License-Identifier: Apache-2.0
 
 # Standard
-from contextlib import redirect_stderr, redirect_stdout
-from time import sleep
-from typing import Optional, cast
+from contextlib import redirect_stderr, redirect_stdout, suppress
+from typing import TYPE_CHECKING, Optional, cast
+import functools
 import logging
 import multiprocessing
+import multiprocessing.connection
 import os
 import pathlib
 
 # Third Party
-from llama_cpp import llama_chat_format, llama_token_get_text
-from llama_cpp.server.app import create_app
-from llama_cpp.server.model import LlamaProxy
-from llama_cpp.server.settings import Settings
 import httpx
-import llama_cpp.server.app as llama_app
 
 # Local
+from ... import log
 from ...client import check_api_base
 from ...configuration import get_api_base
 from .backends import UvicornServer, get_uvicorn_config, is_temp_server_running
@@ -33,8 +30,23 @@ from .common import (
 )
 from .server import BackendServer
 
+if TYPE_CHECKING:
+    # Third Party
+    from llama_cpp import llama_chat_format
+    from llama_cpp.server.model import LlamaProxy
+    import fastapi
+
 logger = logging.getLogger(__name__)
 
+# Maximum number of seconds to wait for a temporary server to start listening
+STARTUP_TIMEOUT = 10
+# Number of seconds a temporary server gets to exit before it is killed
+SHUTDOWN_TIMEOUT = 2
+
+# Use spawn so the server process imports llama_cpp on its own instead of
+# inheriting a parent that had to import it
+_MP_CTX = multiprocessing.get_context("spawn")
+
 
 class Server(BackendServer):
     def __init__(
@@ -53,7 +65,8 @@ class Server(BackendServer):
         self.gpu_layers = gpu_layers
         self.max_ctx_size = max_ctx_size
         self.num_threads = num_threads
-        self.queue: Optional[multiprocessing.Queue] = None
+        self.err_conn: Optional[multiprocessing.connection.Connection] = None
+        self.ready_conn: Optional[multiprocessing.connection.Connection] = None
         self.process: multiprocessing.Process | None = None
 
     def run(self):
@@ -73,10 +86,13 @@ class Server(BackendServer):
             raise exc
 
     def create_server_process(self, port: int) -> multiprocessing.Process:
-        mpctx = multiprocessing.get_context(None)
-        self.queue = mpctx.Queue()
+        # The server process sends its startup error, if any, on err_send and
+        # writes to ready_send once it is listening
+        self.err_conn, err_send = _MP_CTX.Pipe(duplex=False)
+        self.ready_conn, ready_send = _MP_CTX.Pipe(duplex=False)
+        self.register_resources([self.err_conn, err_send, self.ready_conn, ready_send])
 
-        server_process = mpctx.Process(
+        server_process = _MP_CTX.Process(
             target=server,
             kwargs={
                 "model_path": self.model_path,
@@ -86,7 +102,13 @@ class Server(BackendServer):
                 "model_family": self.model_family,
                 "port": port,
                 "host": self.host,
-                "queue": self.queue,
+                "err_conn": err_send,
+                "ready_conn": ready_send,
+                # a spawned process starts with unconfigured logging, hand it ours
+                "log_level": logging.getLevelName(logger.getEffectiveLevel()),
+                "debug_level": 2
+                if logging.getLogger().isEnabledFor(logging.DEBUG)
+                else 1,
             },
         )
 
@@ -99,35 +121,43 @@ class Server(BackendServer):
         foreground_allowed: bool = False,
         max_startup_retries: int = 0,
     ) -> str:
-        logger.info(f"Trying to connect to model server at {self.api_base}")
+        logger.info("Trying to connect to model server at %s", self.api_base)
         if check_api_base(self.api_base, http_client):
             return self.api_base
         try:
             self.port = free_tcp_ipv4_port(self.host)
             # start new server
             self.api_base = str(get_api_base(f"{self.host}:{self.port}"))
-            logger.debug(f"Starting a temporary server at {self.api_base}...")
+            logger.debug("Starting a temporary server at %s...", self.api_base)
             self.process = self.create_server_process(self.port)
             self.process.start()
 
             # in case the server takes some time to fail we wait a bit
             logger.debug("Waiting for the server to start...")
-            count = 0
-            while self.process.is_alive():
-                sleep(0.1)
-                if check_api_base(self.api_base, http_client):
-                    break
-                if count > 50:
-                    logger.error("failed to reach the API server")
-                    break
-                count += 1
-
-            logger.debug("Server started.")
-
-            # if the queue is not empty it means the server failed to start
-            if self.queue is not None and not self.queue.empty():
+            # Block until the server process reports that uvicorn is listening
+            # or the process exits, whichever comes first
+            assert self.ready_conn is not None
+            ready = multiprocessing.connection.wait(
+                [self.ready_conn, self.process.sentinel], timeout=STARTUP_TIMEOUT
+            )
+            # if an error was sent it means the server failed to start
+            if self.err_conn is not None and self.err_conn.poll():
                 # pylint: disable=raise-missing-from
-                raise self.queue.get()
+                raise self.err_conn.recv()
+
+            # Nothing is ready on timeout, the server may still come up later
+            if not ready:
+                logger.error("failed to reach the API server")
+            # Only the sentinel is ready: the server exited without reporting an
+            # error, e.g. uvicorn failed to bind the port
+            elif self.ready_conn not in ready:
+                raise ServerException(
+                    f"llama-cpp server exited with code {self.process.exitcode} before it was ready"
+                )
+            elif not check_api_base(self.api_base, http_client):
+                logger.error("failed to reach the API server")
+            else:
+                logger.debug("Server started.")
 
         except ServerException as exc:
             self.shutdown()
@@ -135,15 +165,21 @@ class Server(BackendServer):
         return self.api_base
 
     def shutdown(self):
-        """Stop the server process and close the queue."""
-
-        super().shutdown()
+        """Stop the server process and close its pipes."""
 
-        if self.process and self.queue:
+        if self.process:
+            # The temporary server ignores SIGINT (see UvicornServer.handle_exit),
+            # ask it to exit with SIGTERM and kill it if it does not in time
             self.process.terminate()
-            self.process.join(timeout=30)
-            self.queue.close()
-            self.queue.join_thread()
+            self.process.join(timeout=SHUTDOWN_TIMEOUT)
+            if self.process.is_alive():
+                logger.debug(
+                    "Server process %s did not exit, killing it", self.process.pid
+                )
+                self.process.kill()
+                self.process.join()
+
+        super().shutdown()
 
     def get_backend_type(self):
         return LLAMA_CPP
@@ -158,47 +194,58 @@ def server(
     threads=None,
     host: str = "localhost",
     port: int = 8000,
-    queue: Optional[multiprocessing.Queue] = None,
+    err_conn: Optional[multiprocessing.connection.Connection] = None,
+    ready_conn: Optional[multiprocessing.connection.Connection] = None,
+    log_level: Optional[str] = None,
+    debug_level: int = 0,
 ):
     """Start OpenAI-compatible server"""
-    settings = Settings(
-        host=host,
-        port=port,
-        model=model_path.as_posix(),
-        n_ctx=max_ctx_size,
-        n_gpu_layers=gpu_layers,
-        verbose=logger.isEnabledFor(logging.DEBUG),
-    )
-    if threads is not None:
-        settings.n_threads = threads
-    try:
-        app = create_app(settings=settings)
+    if log_level is not None:
+        log.configure_logging(log_level=log_level, debug_level=debug_level)
 
-        @app.get("/")
-        def read_root():
-            return {"message": API_ROOT_WELCOME_MESSAGE}
+    try:
+        app = create_server_app(
+            model_path=model_path,
+            max_ctx_size=max_ctx_size,
+            gpu_layers=gpu_layers,
+            threads=threads,
+            host=host,
+            port=port,
+            verbose=logger.isEnabledFor(logging.DEBUG),
+        )
     except ValueError as exc:
-        if queue:
-            queue.put(exc)
-            queue.close()
-            queue.join_thread()
+        if err_conn:
+            err_conn.send(exc)
+            err_conn.close()
             return
         raise ServerException(f"failed creating the server application: {exc}") from exc
 
     # Update chat template if necessary
-    augment_chat_template(chat_template, model_family, model_path, queue)
+    augment_chat_template(chat_template, model_family, model_path, err_conn)
 
     logger.info("Starting server process, press CTRL+C to shutdown server...")
     logger.info(
-        f"After application startup complete see http://{host}:{port}/docs for API."
+        "After application startup complete see http://%s:%s/docs for API.", host, port
     )
 
+    # uvloop is optional; when it is installed use it for a lower-overhead loop
+    with suppress(ImportError):
+        # Third Party
+        import uvloop
+
+        uvloop.install()
+
     config = get_uvicorn_config(
         app=app,
         host=host,
         port=port,
     )
-    s = UvicornServer(config)
+    on_ready = (
+        functools.partial(ready_conn.send_bytes, b"ready")
+        if ready_conn is not None
+        else None
+    )
+    s = UvicornServer(config, on_ready=on_ready)
 
     # If this is not the main process, this is the temp server process that ran in the background
     # after `ilab model chat` was executed.
@@ -216,17 +263,55 @@ def server(
     else:
         s.run()
 
-    if queue:
-        queue.close()
-        queue.join_thread()
+
+@functools.lru_cache(maxsize=1)
+def create_server_app(
+    model_path: pathlib.Path,
+    max_ctx_size: int,
+    gpu_layers: int,
+    threads: Optional[int],
+    host: str,
+    port: int,
+    verbose: bool,
+) -> "fastapi.FastAPI":
+    """Create the llama-cpp FastAPI application, reused while the settings are unchanged
+
+    create_app() loads the model into a llama_cpp module global, so only the most
+    recently created application can be cached: creating another one replaces
+    that global.
+    """
+    # Third Party
+    from llama_cpp.server.app import create_app
+    from llama_cpp.server.settings import Settings
+
+    settings = Settings(
+        host=host,
+        port=port,
+        model=model_path.as_posix(),
+        n_ctx=max_ctx_size,
+        n_gpu_layers=gpu_layers,
+        verbose=verbose,
+    )
+    if threads is not None:
+        settings.n_threads = threads
+    app = create_app(settings=settings)
+
+    @app.get("/")
+    def read_root():
+        return {"message": API_ROOT_WELCOME_MESSAGE}
+
+    return app
 
 
 def augment_chat_template(
     chat_template: str,
     model_family: str,
     model_path: pathlib.Path,
-    queue: Optional[multiprocessing.Queue],
+    err_conn: Optional[multiprocessing.connection.Connection],
 ):
+    # Third Party
+    import llama_cpp.server.app as llama_app
+
     # chat template takes the format ('auto' | 'tokenizer' | a filesystem path to a file)
     if chat_template == CHAT_TEMPLATE_TOKENIZER:
         # llama_cpp_python calculates from the tokenizer config on load, so
@@ -248,38 +333,53 @@ def augment_chat_template(
         logger.info("Replacing chat template:\n %s", template)
 
         for proxy in llama_app.get_llama_proxy():
-            proxy().chat_handler = llama_chat_format.Jinja2ChatFormatter(
-                template=template,
+            proxy().chat_handler = get_chat_handler(
+                template,
                 # Use the model defined eos and bos if either is not
                 # defined (when a custom template is used)
                 eos_token=resolve_token_eos(eos_token, proxy),
                 bos_token=resolve_token_bos(bos_token, proxy),
-            ).to_chat_handler()
+            )
     # pylint: disable=broad-exception-caught
     except Exception as exc:
-        if queue:
-            queue.put(exc)
-            queue.close()
-            queue.join_thread()
+        if err_conn:
+            err_conn.send(exc)
+            err_conn.close()
             return
         raise ServerException(f"failed creating the server application: {exc}") from exc
 
 
-def resolve_token_eos(eos_token: Optional[str], proxy: LlamaProxy) -> str:
+@functools.lru_cache(maxsize=8)
+def get_chat_handler(
+    template: str, eos_token: str, bos_token: str
+) -> "llama_chat_format.LlamaChatCompletionHandler":
+    """Build a chat handler from a Jinja template, compiled once per process"""
+    # Third Party
+    from llama_cpp import llama_chat_format
+
+    return llama_chat_format.Jinja2ChatFormatter(
+        template=template, eos_token=eos_token, bos_token=bos_token
+    ).to_chat_handler()
+
+
+def resolve_token_eos(eos_token: Optional[str], proxy: "LlamaProxy") -> str:
     if eos_token is not None:
         return eos_token
 
     return resolve_token(proxy, proxy().token_eos())
 
 
-def resolve_token_bos(bos_token: Optional[str], proxy: LlamaProxy) -> str:
+def resolve_token_bos(bos_token: Optional[str], proxy: "LlamaProxy") -> str:
     if bos_token is not None:
         return bos_token
 
     return resolve_token(proxy, proxy().token_bos())
 
 
-def resolve_token(proxy: LlamaProxy, token: int) -> str:
+def resolve_token(proxy: "LlamaProxy", token: int) -> str:
+    # Third Party
+    from llama_cpp import llama_token_get_text
+
     result = llama_token_get_text(proxy().model, token).decode("utf-8")
     return cast(str, result)
 
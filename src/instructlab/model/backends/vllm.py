@@ -9,6 +9,7 @@ import pathlib
 import subprocess
 import sys
 import tempfile
+import threading
 import time
 import typing
 
@@ -34,6 +35,9 @@ from .server import BackendServer
 
 logger = logging.getLogger(__name__)
 
+# uvicorn logs this line on stderr once the vLLM API server is listening
+VLLM_READY_MARKER = b"Uvicorn running on"
+
 
 class Server(BackendServer):
     def __init__(
@@ -56,6 +60,7 @@ class Server(BackendServer):
         self.vllm_args = list(vllm_args) if vllm_args is not None else []
         self.process: subprocess.Popen | None = None
         self.max_startup_attempts = max_startup_attempts
+        self.stderr_watcher: threading.Thread | None = None
 
     def run(self):
         self.process, files = run_vllm(
@@ -80,7 +85,12 @@ class Server(BackendServer):
         finally:
             self.shutdown()
 
-    def create_server_process(self, port: int, background: bool) -> subprocess.Popen:
+    def create_server_process(
+        self,
+        port: int,
+        background: bool,
+        capture_stderr: bool = False,
+    ) -> subprocess.Popen:
         server_process, files = run_vllm(
             self.host,
             port,
@@ -89,6 +99,7 @@ class Server(BackendServer):
             self.chat_template,
             self.vllm_args,
             background=background,
+            capture_stderr=capture_stderr,
         )
         self.register_resources(files)
         return server_process
@@ -102,30 +113,108 @@ class Server(BackendServer):
         """Checks if server is running, if not starts one as a subprocess. Returns the server process
         and the URL where it's available."""
 
-        logger.info(f"Trying to connect to model server at {self.api_base}")
+        logger.info("Trying to connect to model server at %s", self.api_base)
         if check_api_base(self.api_base, http_client):
             return (None, self.api_base)
         port = free_tcp_ipv4_port(self.host)
-        logger.debug(f"Using available port {port} for temporary model serving.")
+        logger.debug("Using available port %s for temporary model serving.", port)
 
         host_port = f"{self.host}:{port}"
         temp_api_base = get_api_base(host_port)
-        vllm_server_process = self.create_server_process(port, background)
+        # In the background vLLM's stderr is ours to read, so we wait for it to
+        # report that it is listening. In the foreground its output goes to the
+        # terminal and we fall back to polling the API.
+        vllm_server_process = self.create_server_process(
+            port, background, capture_stderr=background
+        )
         logger.info("Starting a temporary vLLM server at %s", temp_api_base)
-        count = 0
         # Each call to check_api_base takes >2s + 2s sleep
         # Default to 120 if not specified (~8 mins of wait time)
         vllm_startup_max_attempts = self.max_startup_attempts or 120
         start_time_secs = time.time()
-        while count < vllm_startup_max_attempts:
-            count += 1
+        if background:
+            started = self._wait_for_startup(
+                vllm_server_process,
+                temp_api_base,
+                http_client,
+                foreground_allowed,
+                timeout=vllm_startup_max_attempts * 4,
+            )
+        else:
+            started = self._poll_for_startup(
+                vllm_server_process,
+                temp_api_base,
+                http_client,
+                foreground_allowed,
+                vllm_startup_max_attempts,
+            )
+        if not started:
+            duration = round(time.time() - start_time_secs, 1)
+            shutdown_process(vllm_server_process, 20)
+            # pylint: disable=raise-missing-from
+            raise ServerException(f"vLLM failed to start up in {duration} seconds")
+        logger.info("vLLM engine successfully started at %s", temp_api_base)
+        return (vllm_server_process, temp_api_base)
+
+    def _wait_for_startup(
+        self,
+        vllm_server_process: subprocess.Popen,
+        temp_api_base: str,
+        http_client,
+        foreground_allowed: bool,
+        timeout: int,
+    ) -> bool:
+        """Wait for vLLM to start, waking up as soon as it reports on stderr that it
+        is listening. The API is also probed every 2 seconds, so a server whose log
+        level hides that line (e.g. --uvicorn-log-level warning) is still detected.
+        Returns False when the server did not start in time."""
+        startup_event = threading.Event()
+        self.stderr_watcher = threading.Thread(
+            target=watch_for_startup,
+            args=(vllm_server_process.stderr, startup_event),
+            daemon=True,
+        )
+        self.stderr_watcher.start()
+
+        logger.info(
+            "Waiting up to %s seconds for the vLLM server to start at %s, this might take a moment...",
+            timeout,
+            temp_api_base,
+        )
+        deadline = time.monotonic() + timeout
+        while True:
+            # watch_for_startup also sets the event when stderr is closed, which
+            # happens when vLLM exits, so a crash wakes us up right away
+            marker_seen = startup_event.wait(2)
+            if vllm_server_process.poll() is not None:
+                raise_startup_failure(foreground_allowed, background=True)
+            if check_api_base(temp_api_base, http_client):
+                return True
+            if time.monotonic() >= deadline:
+                logger.info(
+                    "Gave up waiting for vLLM server to start at %s after %s seconds",
+                    temp_api_base,
+                    timeout,
+                )
+                return False
+            if marker_seen:
+                # the event stays set, keep probing at the same pace
+                time.sleep(2)
+
+    def _poll_for_startup(
+        self,
+        vllm_server_process: subprocess.Popen,
+        temp_api_base: str,
+        http_client,
+        foreground_allowed: bool,
+        vllm_startup_max_attempts: int,
+    ) -> bool:
+        """Poll the API until the vLLM server answers. Returns False when the server
+        did not start after vllm_startup_max_attempts attempts."""
+        for count in range(1, vllm_startup_max_attempts + 1):
             # Check if the process is still alive
             if vllm_server_process.poll():
-                if foreground_allowed and background:
-                    raise ServerException(
-                        "vLLM failed to start.  Retry with --enable-serving-output to learn more about the failure."
-                    )
-                raise ServerException("vLLM failed to start.")
+                raise_startup_failure(foreground_allowed, background=False)
             logger.info(
                 "Waiting for the vLLM server to start at %s, this might take a moment... Attempt: %s/%s",
                 temp_api_base,
@@ -133,20 +222,15 @@ class Server(BackendServer):
                 vllm_startup_max_attempts,
             )
             if check_api_base(temp_api_base, http_client):
-                logger.info("vLLM engine successfully started at %s", temp_api_base)
-                break
-            if count == vllm_startup_max_attempts:
-                logger.info(
-                    "Gave up waiting for vLLM server to start at %s after %s attempts",
-                    temp_api_base,
-                    vllm_startup_max_attempts,
-                )
-                duration = round(time.time() - start_time_secs, 1)
-                shutdown_process(vllm_server_process, 20)
-                # pylint: disable=raise-missing-from
-                raise ServerException(f"vLLM failed to start up in {duration} seconds")
-            time.sleep(2)
-        return (vllm_server_process, temp_api_base)
+                return True
+            if count < vllm_startup_max_attempts:
+                time.sleep(2)
+        logger.info(
+            "Gave up waiting for vLLM server to start at %s after %s attempts",
+            temp_api_base,
+            vllm_startup_max_attempts,
+        )
+        return False
 
     def run_detached(
         self,
@@ -180,13 +264,19 @@ class Server(BackendServer):
     def shutdown(self):
         """Shutdown vLLM server"""
 
-        super().shutdown()
-
         # Needed when a temporary server is started
         if self.process is not None:
             shutdown_process(self.process, 20)
             self.process = None
 
+        # The process group is gone so the stderr watcher reaches EOF, it must be
+        # done reading before its stream gets closed with the other resources
+        if self.stderr_watcher is not None:
+            self.stderr_watcher.join(timeout=5)
+            self.stderr_watcher = None
+
+        super().shutdown()
+
     def get_backend_type(self):
         return VLLM
 
@@ -251,6 +341,7 @@ def run_vllm(
     chat_template: str,
     vllm_args: list[str],
     background: bool,
+    capture_stderr: bool = False,
 ) -> typing.Tuple[subprocess.Popen, list[Closeable]]:
     """
     Start an OpenAI-compatible server with vLLM.
@@ -269,10 +360,13 @@ def run_vllm(
                                         Example: ["--dtype", "auto", "--enable-lora"]
         background (bool):            Whether the stdout and stderr vLLM should be sent to /dev/null (True)
                                       or stay in the foreground(False).
+        capture_stderr (bool):        Whether stderr of vLLM should be captured in a pipe to be
+                                      consumed with watch_for_startup. Only used in the background.
     Returns:
         tuple: A tuple containing two values:
             vllm_process (subprocess.Popen): process of the vllm server
-            tmp_files: a list of temporary files necessary to launch the process
+            tmp_files: a list of temporary files necessary to launch the process,
+                       including the captured stderr stream
 
     """
     vllm_process = None
@@ -280,7 +374,7 @@ def run_vllm(
         host, port, model_family, model_path, chat_template, vllm_args
     )
 
-    logger.debug(f"vLLM serving command is: {vllm_cmd}")
+    logger.debug("vLLM serving command is: %s", vllm_cmd)
 
     vllm_env = os.environ.copy()
     # Reset vllm logging to the default (enabled)
@@ -292,10 +386,12 @@ def run_vllm(
             vllm_process = subprocess.Popen(
                 args=vllm_cmd,
                 stdout=subprocess.DEVNULL,
-                stderr=subprocess.DEVNULL,
+                stderr=subprocess.PIPE if capture_stderr else subprocess.DEVNULL,
                 env=vllm_env,
                 start_new_session=True,
             )
+            if vllm_process.stderr is not None:
+                tmp_files.append(vllm_process.stderr)
         else:
             # pylint: disable=consider-using-with
             vllm_process = subprocess.Popen(
@@ -314,6 +410,32 @@ def run_vllm(
     return vllm_process, tmp_files
 
 
+def watch_for_startup(stream: typing.IO[bytes], startup_event: threading.Event) -> None:
+    """
+    Drain the vLLM server output and set startup_event once the server is listening.
+
+    The whole stream is consumed so vLLM never blocks on a full pipe. The event is
+    also set when the stream is closed, i.e. vLLM exited, so waiters do not hang on
+    a server that will never be listening; they should check the process state.
+
+    Args:
+        stream        (IO[bytes]):       stderr of the vLLM server process
+        startup_event (threading.Event): event to set once the server is listening
+    """
+    for line in stream:
+        if not startup_event.is_set() and VLLM_READY_MARKER in line:
+            startup_event.set()
+    startup_event.set()
+
+
+def raise_startup_failure(foreground_allowed: bool, background: bool) -> None:
+    if foreground_allowed and background:
+        raise ServerException(
+            "vLLM failed to start.  Retry with --enable-serving-output to learn more about the failure."
+        )
+    raise ServerException("vLLM failed to start.")
+
+
 def is_bnb_quantized(model_path: pathlib.Path) -> bool:
     """
     Check if provided model has quantization config with bitsandbytes specified.
@@ -114,9 +114,6 @@ def serve(
     vLLm parameters are documented at
     https://docs.vllm.ai/en/stable/serving/openai_compatible_server.html
     """
-    # First Party
-    from instructlab.model.backends import llama_cpp, vllm
-
     host, port = utils.split_hostport(ctx.obj.config.serve.host_port)
 
     try:
@@ -132,13 +129,20 @@ def serve(
         chat_template = ctx.obj.config.serve.chat_template
 
     logger.info(
-        f"Using model '{model_path}' with {gpu_layers} gpu-layers and {max_ctx_size} max context size."
+        "Using model '%s' with %s gpu-layers and %s max context size.",
+        model_path,
+        gpu_layers,
+        max_ctx_size,
     )
 
-    logger.info(f"Serving model '{model_path}' with {backend}")
+    logger.info("Serving model '%s' with %s", model_path, backend)
 
     backend_instance: BackendServer
+    # Only import the selected backend module
     if backend == backends.LLAMA_CPP:
+        # First Party
+        from instructlab.model.backends import llama_cpp
+
         if ctx.args:
             ctx.fail(f"Unsupported extra arguments: {', '.join(ctx.args)}")
         backend_instance = llama_cpp.Server(
@@ -154,14 +158,14 @@ def serve(
         )
     elif backend == backends.VLLM:
         # First Party
-        from instructlab.model.backends.vllm import contains_argument
+        from instructlab.model.backends import vllm
 
         # Warn if unsupported backend parameters are passed
         warn_for_unsuported_backend_param(ctx)
 
         ctx.obj.config.serve.vllm.vllm_args = ctx.obj.config.serve.vllm.vllm_args or []
         if gpus:
-            if contains_argument(
+            if vllm.contains_argument(
                 "--tensor-parallel-size", ctx.obj.config.serve.vllm.vllm_args
             ):
                 logger.info(
@@ -180,7 +184,7 @@ def serve(
             # any vllm flag included in ctx.args (click arguments after "--"),
             # has precedence over the value over the flags in serve.vllm.vllm_args
             # section of the config and the value of the flag `--gpus`.
-            if gpus and contains_argument("--tensor-parallel-size", ctx.args):
+            if gpus and vllm.contains_argument("--tensor-parallel-size", ctx.args):
                 logger.info(
                     "'--gpus' flag used alongside '--tensor-parallel-size' flag in `ilab model serve`. Using value of the --tensor-parallel-size flag."
                 )
@@ -221,5 +225,5 @@ def warn_for_unsuported_backend_param(
     for param in ["gpu_layers", "num_threads", "max_ctx_size"]:
         if ctx.get_parameter_source(param) == click.core.ParameterSource.COMMANDLINE:
             logger.warning(
-                f"Option '--{param.replace('_','-')}' not supported by the backend."
+                "Option '--%s' not supported by the backend.", param.replace("_", "-")
             )
@@ -1,20 +1,34 @@
 # Standard
 from unittest import mock
 from unittest.mock import patch
+import asyncio
+import io
 import json
+import logging
 import os
 import pathlib
 import socket
 import sys
+import threading
 
 # Third Party
 from click.testing import CliRunner
+import fastapi
 import pytest
+import uvicorn
 
 # First Party
 from instructlab import lab
-from instructlab.model.backends import backends, common
-from instructlab.model.backends.vllm import build_vllm_cmd
+from instructlab.model.backends import backends, common, llama_cpp, vllm
+from instructlab.model.backends.vllm import build_vllm_cmd, watch_for_startup
+
+
+@pytest.fixture(autouse=True)
+def clear_gguf_cache():
+    """Do not leak (possibly mocked) GGUF detection results between tests"""
+    backends._cached_is_model_gguf.cache_clear()
+    yield
+    backends._cached_is_model_gguf.cache_clear()
 
 
 # helper function to create dummy valid and invalid safetensor or bin model directories
@@ -63,17 +77,75 @@ def test_get_backend_auto_detection_fail_not_gguf(tmp_path: pathlib.Path):
     assert "is not a GGUF format" in str(exc_info.value)
 
 
+@pytest.mark.parametrize(
+    "content,expected",
+    [
+        (b"GGUF" + bytes([0] * 28), True),
+        (b"\x00\x00\x00\x00" + bytes([0] * 28), False),
+        (b"GG", False),
+        (b"", False),
+    ],
+)
+def test_is_model_gguf(content: bytes, expected: bool, tmp_path: pathlib.Path):
+    tmp_gguf = tmp_path / "test.gguf"
+    tmp_gguf.write_bytes(content)
+    assert backends.is_model_gguf(tmp_gguf) == expected
+
+
+def test_is_model_gguf_not_a_file(tmp_path: pathlib.Path):
+    assert not backends.is_model_gguf(tmp_path)
+    assert not backends.is_model_gguf(tmp_path / "missing.gguf")
+
+
 # this test succeeds because the model_path is a valid GGUF file (is_model_gguf mocked to returns True)
 @patch("instructlab.model.backends.backends.is_model_gguf", return_value=True)
 def test_get_backend_auto_detection_success_gguf(
     m_is_model_gguf, tmp_path: pathlib.Path
 ):
     tmp_gguf = tmp_path / "test.gguf"
+    tmp_gguf.touch()
     backend = backends.get(tmp_gguf, None)
     assert backend == "llama-cpp"
     m_is_model_gguf.assert_called_once_with(tmp_gguf)
 
 
+# repeated auto-detection of an unchanged file only reads the GGUF header once
+@patch("instructlab.model.backends.backends.is_model_gguf", return_value=True)
+def test_determine_backend_gguf_cached(m_is_model_gguf, tmp_path: pathlib.Path):
+    tmp_gguf = tmp_path / "test.gguf"
+    tmp_gguf.write_bytes(b"GGUF")
+    for _ in range(3):
+        assert backends.determine_backend(tmp_gguf)[0] == backends.LLAMA_CPP
+    m_is_model_gguf.assert_called_once_with(tmp_gguf.resolve())
+
+    # a symlink to the same file shares the cached result
+    tmp_link = tmp_path / "link.gguf"
+    tmp_link.symlink_to(tmp_gguf)
+    assert backends.determine_backend(tmp_link)[0] == backends.LLAMA_CPP
+    assert m_is_model_gguf.call_count == 1
+
+    # a modified file is checked again
+    tmp_gguf.write_bytes(b"GGUF" + bytes([0] * 4))
+    assert backends.determine_backend(tmp_gguf)[0] == backends.LLAMA_CPP
+    assert m_is_model_gguf.call_count == 2
+
+    # so is a file replaced by another one of the same size
+    tmp_new = tmp_path / "new.gguf"
+    tmp_new.write_bytes(b"GGUF" + bytes([1] * 4))
+    tmp_new.replace(tmp_gguf)
+    assert backends.determine_backend(tmp_gguf)[0] == backends.LLAMA_CPP
+    assert m_is_model_gguf.call_count == 3
+
+
+# a directory that is not a valid safetensors model is rejected without reading it as GGUF
+@patch("instructlab.model.backends.backends.is_model_gguf")
+def test_determine_backend_dir_not_gguf(m_is_model_gguf, tmp_path: pathlib.Path):
+    with pytest.raises(ValueError) as exc_info:
+        backends.determine_backend(tmp_path)
+    assert "is not a GGUF format" in str(exc_info.value)
+    m_is_model_gguf.assert_not_called()
+
+
 # this tests both cases where a valid and invalid safetensors model directory is supplied
 @pytest.mark.parametrize(
     "model_dir,model_file_type,expected",
@@ -322,3 +394,188 @@ def test_build_vllm_cmd_with_bnb_quant(tmp_path: pathlib.Path):
         host, port, model_family, model_path, str(chat_template), vllm_args
     )
     assert cmd == expected_cmd
+
+
+def test_watch_for_startup_ready():
+    startup_event = threading.Event()
+    read_fd, write_fd = os.pipe()
+    with os.fdopen(read_fd, "rb") as stream, os.fdopen(write_fd, "wb") as writer:
+        watcher = threading.Thread(
+            target=watch_for_startup, args=(stream, startup_event), daemon=True
+        )
+        watcher.start()
+        writer.write(b"INFO 08-01 12:00:00 api_server.py:212] vLLM API server\n")
+        writer.flush()
+        assert not startup_event.wait(0.2)
+
+        # the event is set while vLLM is still running
+        writer.write(b"INFO:     Uvicorn running on http://127.0.0.1:8000\n")
+        writer.flush()
+        assert startup_event.wait(5)
+        assert watcher.is_alive()
+        writer.close()
+        watcher.join(5)
+        assert not watcher.is_alive()
+
+
+def test_watch_for_startup_drains_stream_on_exit():
+    startup_event = threading.Event()
+    stream = io.BytesIO(
+        b"INFO 08-01 12:00:00 api_server.py:212] vLLM API server\n" * 10
+    )
+    watch_for_startup(stream, startup_event)
+    # an exited server also wakes up the waiters
+    assert startup_event.is_set()
+    assert stream.read() == b""
+
+
+@pytest.mark.parametrize("api_up", [True, False])
+def test_vllm_wait_for_startup_probes_api(api_up: bool):
+    server = vllm.Server(
+        api_base="http://127.0.0.1:8000/v1",
+        model_family="merlinite",
+        model_path=pathlib.Path("model"),
+        chat_template="",
+        host="127.0.0.1",
+        port=8000,
+    )
+    process = mock.Mock()
+    process.poll.return_value = None
+    # the ready marker never shows up, e.g. with --uvicorn-log-level warning
+    process.stderr = io.BytesIO(b"WARNING something unrelated\n")
+
+    with patch.object(vllm, "check_api_base", return_value=api_up) as m_check:
+        started = server._wait_for_startup(
+            process, "http://127.0.0.1:8000/v1", None, False, timeout=0
+        )
+    assert started is api_up
+    m_check.assert_called_once()
+    server.stderr_watcher.join()
+
+
+@pytest.mark.parametrize("should_exit,expected_calls", [(False, 1), (True, 0)])
+def test_uvicorn_server_on_ready(should_exit: bool, expected_calls: int):
+    on_ready = mock.Mock()
+    server = backends.UvicornServer(
+        uvicorn.Config(fastapi.FastAPI()), on_ready=on_ready
+    )
+
+    async def startup(_, sockets=None):  # pylint: disable=unused-argument
+        # uvicorn sets should_exit when the application failed to start
+        server.should_exit = should_exit
+
+    with patch.object(uvicorn.Server, "startup", startup):
+        asyncio.run(server.startup())
+    assert on_ready.call_count == expected_calls
+
+
+def llama_cpp_server() -> llama_cpp.Server:
+    return llama_cpp.Server(
+        model_path=pathlib.Path("model.gguf"),
+        model_family="merlinite",
+        chat_template="",
+        api_base="http://127.0.0.1:8000/v1",
+        host="127.0.0.1",
+        port=8000,
+        gpu_layers=-1,
+        max_ctx_size=4096,
+        num_threads=None,
+    )
+
+
+@pytest.mark.parametrize(
+    "level,expected", [(logging.DEBUG, "DEBUG"), (logging.WARNING, "WARNING")]
+)
+def test_llama_cpp_server_process_log_level(level: int, expected: str):
+    server = llama_cpp_server()
+    with (
+        patch.object(llama_cpp.logger, "level", level),
+        patch.object(llama_cpp._MP_CTX, "Process") as m_process,
+    ):
+        server.create_server_process(8000)
+    server.shutdown()
+    # the spawned server configures its logging from these
+    assert m_process.call_args.kwargs["kwargs"]["log_level"] == expected
+
+
+@pytest.mark.parametrize(
+    "state,api_up,raises,logged_error",
+    [
+        ("ready", True, False, False),
+        ("exited", False, True, False),
+        ("timeout", False, False, True),
+    ],
+)
+def test_llama_cpp_run_detached(
+    state: str,
+    api_up: bool,
+    raises: bool,
+    logged_error: bool,
+    caplog: pytest.LogCaptureFixture,
+):
+    server = llama_cpp_server()
+    process = mock.Mock(exitcode=1)
+    process.is_alive.return_value = False
+    ready_conn = mock.Mock()
+    err_conn = mock.Mock()
+    err_conn.poll.return_value = False
+
+    def create_server_process(_port):
+        server.ready_conn = ready_conn
+        server.err_conn = err_conn
+        return process
+
+    ready = {"ready": [ready_conn], "exited": [process.sentinel], "timeout": []}
+    with (
+        patch.object(server, "create_server_process", create_server_process),
+        patch.object(llama_cpp, "free_tcp_ipv4_port", return_value=8001),
+        # the first probe is for an already running server
+        patch.object(llama_cpp, "check_api_base", side_effect=[False, api_up]),
+        patch.object(
+            llama_cpp.multiprocessing.connection, "wait", return_value=ready[state]
+        ),
+    ):
+        if raises:
+            with pytest.raises(common.ServerException, match="exited with code 1"):
+                server.run_detached()
+            process.terminate.assert_called_once()
+        else:
+            assert server.run_detached() == "http://127.0.0.1:8001/v1"
+            process.terminate.assert_not_called()
+    assert ("failed to reach the API server" in caplog.text) is logged_error
+
+
+@pytest.mark.parametrize("exits,kill_calls", [(True, 0), (False, 1)])
+def test_llama_cpp_shutdown(exits: bool, kill_calls: int):
+    server = llama_cpp_server()
+    server.process = mock.Mock()
+    server.process.is_alive.return_value = not exits
+    conn = mock.Mock()
+    server.register_resources([conn])
+
+    server.shutdown()
+
+    server.process.terminate.assert_called_once()
+    server.process.join.assert_any_call(timeout=llama_cpp.SHUTDOWN_TIMEOUT)
+    assert server.process.kill.call_count == kill_calls
+    conn.close.assert_called_once()
+
+
+@pytest.mark.parametrize(
+    "model_family,model_path,expected_eos,expected_bos",
+    [
+        ("merlinite", "model.gguf", "<|endoftext|>", ""),
+        ("granite", "model.gguf", "<|endoftext|>", ""),
+        ("mixtral", "model.gguf", "</s>", "<s>"),
+        (None, "mixtral-8x7b-instruct.gguf", "</s>", "<s>"),
+    ],
+)
+def test_get_model_template(
+    model_family: str | None, model_path: str, expected_eos: str, expected_bos: str
+):
+    template, eos_token, bos_token = common.get_model_template(
+        model_family, pathlib.Path(model_path)
+    )
+    assert template
+    assert eos_token == expected_eos
+    assert bos_token == expected_bos
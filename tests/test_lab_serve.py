@@ -333,5 +333,5 @@ def test_warn_for_unsuported_backend_param(param, expected_call_count):
         assert mock_warning.call_count == expected_call_count
         if expected_call_count > 0:
             mock_warning.assert_called_with(
-                f"Option '--{param.replace('_','-')}' not supported by the backend."
+                "Option '--%s' not supported by the backend.", param.replace("_", "-")
             )